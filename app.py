@@ -1,9 +1,28 @@
-from flask import Flask, request, jsonify, render_template_string, redirect, url_for
+# Patch blocking I/O before anything else is imported so uploads and
+# downloads yield to other requests under gunicorn's gevent workers
+from gevent import monkey
+monkey.patch_all()
+from gevent.threadpool import ThreadPoolExecutor
+
+from flask import Flask, Response, request, jsonify, redirect, url_for, send_file
 import os
 import uuid
 import datetime
+import functools
+import gzip
+import hashlib
+import hmac
 import json
-from werkzeug.utils import secure_filename
+import re
+import time
+from urllib.parse import unquote
+from werkzeug.http import parse_content_range_header
+import orjson
+import redis
+import ulid
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.parser import ParseFailedException
+from streaming_form_data.targets import FileTarget, ValueTarget
 
 app = Flask(__name__)
 
@@ -12,15 +31,53 @@ UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB max upload
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Read uploads from the socket 1MB at a time
+UPLOAD_WRITE_TIMEOUT = 60  # Seconds to wait for one chunk to reach the disk
+MIN_PART_SIZE = 1024 * 1024  # Smallest part of a multipart upload, except a lone part
+UPLOAD_TTL = 24 * 60 * 60  # Seconds an unfinished upload may sit idle before it is removed
+RESUME_LOCK_TTL = 15 * 60  # Seconds one request may hold a resumable upload's lock
+
+# Characters replaced or dropped when sanitizing uploaded filenames
+FILENAME_TABLE = str.maketrans(
+    {c: '_' for c in '<>:"/\\|?*'} | {c: None for c in range(32)}
+)
+
+# Resumable uploads are keyed by the file's lowercase hex SHA-256
+SHA256_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# Units for format_size, largest first
+SIZE_UNITS = ((1 << 30, 'GB'), (1 << 20, 'MB'), (1 << 10, 'KB'))
+
+# Real OS threads for upload disk writes: gevent cannot make writes to
+# regular files cooperative, so they would otherwise stall every greenlet
+DISK_EXECUTOR = ThreadPoolExecutor(max_workers=4)
 
 # Generate a secure API key if not already set
 # In production, set this as an environment variable on Render
 API_KEY = os.environ.get('API_KEY', str(uuid.uuid4()))
 print(f"API Key: {API_KEY}")
+API_KEY_BYTES = API_KEY.encode()
+AUTH_HEADER = f'Bearer {API_KEY}'.encode()
 
-# Store file information in memory (will reset on server restart)
-# In production, you might want to use a database
-FILES = []
+# Store file information in Redis so every worker sees the same files
+# Each file is a hash at file:<id>; files:index holds the set of file ids
+# In production, set REDIS_URL as an environment variable on Render
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+FILES_INDEX = 'files:index'
+# Set to a fresh ULID on every upload and delete so workers know when file
+# lists change; unlike a counter, it cannot repeat if Redis loses its data
+FILES_VERSION = 'files:version'
+# Unfinished uploads, scored by the time of their last activity: multipart
+# upload ids, and the <digest>.part names of resumable uploads
+UPLOADS_PENDING = 'uploads:pending'
+
+# The FILES_VERSION the /api/files body was built from, the body, and its
+# gzipped copy (empty if the body is too small to be worth compressing)
+FILES_JSON_CACHE = (None, b'', b'')
+# Listings at least this large are also cached gzipped for clients that accept it
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
 
 # HTML template for the web interface
 HTML_TEMPLATE = """
@@ -157,7 +214,13 @@ HTML_TEMPLATE = """
         
         <h3>API Endpoints:</h3>
         <ul>
-            <li><code>POST /api/upload</code> - Upload a file (include file in request body)</li>
+            <li><code>POST /api/upload</code> - Upload a file (multipart <code>file</code> field, or the raw body with <code>Content-Type: application/octet-stream</code> and an <code>X-Filename</code> header)</li>
+            <li><code>HEAD /api/upload</code> - Check for an existing file (<code>If-None-Match</code> with its SHA-256; 304 and <code>X-File-Id</code> if stored)</li>
+            <li><code>HEAD /api/upload/{sha256}</code> - Get how many bytes of a resumable upload arrived (<code>X-Received</code>)</li>
+            <li><code>PUT /api/upload/{sha256}</code> - Send a resumable upload from <code>X-Received</code> on (raw body with <code>Content-Range</code> and <code>X-Filename</code>)</li>
+            <li><code>POST /api/uploads</code> - Start a multipart upload (JSON <code>filename</code>, <code>size</code>, <code>part_size</code>)</li>
+            <li><code>PUT /api/uploads/{upload_id}/part/{n}</code> - Upload part <code>n</code> of a multipart upload (raw body)</li>
+            <li><code>POST /api/uploads/{upload_id}/complete</code> - Finish a multipart upload</li>
             <li><code>GET /api/files</code> - List all files</li>
             <li><code>GET /api/download/{file_id}</code> - Download a specific file</li>
             <li><code>DELETE /api/files/{file_id}</code> - Delete a specific file</li>
@@ -172,23 +235,293 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compile the template once at startup instead of on every page view
+INDEX_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
+# Helper function to check a submitted API key in constant time
+def check_api_key(api_key):
+    return hmac.compare_digest((api_key or '').encode(), API_KEY_BYTES)
+
+# Decorator for API routes: require the Authorization: Bearer header
+def require_api_key(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth_header.encode(), AUTH_HEADER):
+            return jsonify({'error': 'Unauthorized'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Helper function to get the Redis key of a file record
+def file_key(file_id):
+    return f'file:{file_id}'
+
+# Helper function to get the Redis key mapping a SHA-256 digest to a file id
+def digest_key(digest):
+    return f'files:sha256:{digest}'
+
+# Helper functions to get the Redis keys of an in-progress multipart upload
+def upload_key(upload_id):
+    return f'upload:{upload_id}'
+
+def upload_parts_key(upload_id):
+    return f'upload:{upload_id}:parts'
+
+# Helper function to keep an active multipart upload's keys alive
+def touch_upload(upload_id):
+    pipe = redis_client.pipeline()
+    pipe.expire(upload_key(upload_id), UPLOAD_TTL)
+    pipe.expire(upload_parts_key(upload_id), UPLOAD_TTL)
+    pipe.zadd(UPLOADS_PENDING, {upload_id: time.time()})
+    pipe.execute()
+
+# Helper function to remove uploads idle for longer than UPLOAD_TTL, along
+# with their files (each member of UPLOADS_PENDING names its file)
+def expire_stale_uploads():
+    for upload_id in redis_client.zrangebyscore(UPLOADS_PENDING, 0, time.time() - UPLOAD_TTL):
+        # Only the worker whose zrem succeeds cleans up
+        if redis_client.zrem(UPLOADS_PENDING, upload_id):
+            redis_client.delete(upload_key(upload_id), upload_parts_key(upload_id))
+            discard_upload(os.path.join(UPLOAD_FOLDER, upload_id))
+
+# Helper function to get where the bytes of a resumable upload are kept
+# until it completes, or None if the digest is malformed
+def resume_path(digest):
+    if not SHA256_PATTERN.fullmatch(digest):
+        return None
+    return os.path.join(UPLOAD_FOLDER, f'{digest}.part')
+
+# Helper function to get the Redis key locking a resumable upload
+def resume_lock_key(digest):
+    return f'upload:{digest}:lock'
+
+# Helper functions to hold a resumable upload's lock, so only one request at
+# a time appends to its file; the lock expires if its worker dies
+def acquire_resume_lock(digest):
+    token = ulid.new().str
+    if redis_client.set(resume_lock_key(digest), token, nx=True, ex=RESUME_LOCK_TTL):
+        return token
+    return None
+
+def release_resume_lock(digest, token):
+    # Only delete the lock while it is still ours: after a very slow upload
+    # it may have expired and been taken by another request
+    key = resume_lock_key(digest)
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.get(key) == token:
+                pipe.multi()
+                pipe.delete(key)
+                pipe.execute()
+        except redis.WatchError:
+            pass
+
+# Helper function to get how many bytes of a resumable upload have arrived
+def received_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except FileNotFoundError:
+        return 0
+
+# Helper function to decode a file record read back from Redis
+def load_file_info(record):
+    if not record:
+        return None
+    record['size_bytes'] = int(record['size_bytes'])
+    # Records stored before sizes were formatted at upload time
+    if 'size_formatted' not in record:
+        record['size_formatted'] = format_size(record['size_bytes'])
+    return record
+
 # Helper function to get file info
 def get_file_info(file_id):
-    for file in FILES:
-        if file['id'] == file_id:
-            return file
-    return None
+    return load_file_info(redis_client.hgetall(file_key(file_id)))
+
+# Helper function to get the stored file with a given SHA-256, if any
+# A record whose file is gone is dropped so the content can be uploaded again
+def find_file_by_digest(digest):
+    file_id = redis_client.get(digest_key(digest))
+    file_info = get_file_info(file_id) if file_id else None
+    if file_info and not os.path.exists(file_info['path']):
+        remove_file_info(file_info)
+        return None
+    return file_info
+
+# Helper function to get every file record in one round-trip, oldest first
+# File ids are ULIDs, so sorting the ids sorts the files by upload time
+def list_file_info():
+    file_ids = sorted(redis_client.smembers(FILES_INDEX))
+    pipe = redis_client.pipeline()
+    for file_id in file_ids:
+        pipe.hgetall(file_key(file_id))
+    return [load_file_info(record) for record in pipe.execute() if record]
+
+# Helper function to store a new file record
+def add_file_info(file_info):
+    pipe = redis_client.pipeline()
+    pipe.hset(file_key(file_info['id']), mapping=file_info)
+    pipe.sadd(FILES_INDEX, file_info['id'])
+    pipe.set(digest_key(file_info['sha256']), file_info['id'])
+    pipe.set(FILES_VERSION, ulid.new().str)
+    pipe.execute()
+
+# Helper function to build and store the record of a newly uploaded file
+def record_file(file_id, file_path, original_name, size_bytes, sha256):
+    file_info = {
+        'id': file_id,
+        'filename': safe_filename(original_name),
+        'path': file_path,
+        'size_bytes': size_bytes,
+        'size_formatted': format_size(size_bytes),
+        'sha256': sha256,
+        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    add_file_info(file_info)
+    return file_info
+
+# Helper function to drop a file record
+def remove_file_info(file_info):
+    pipe = redis_client.pipeline()
+    pipe.delete(file_key(file_info['id']))
+    pipe.srem(FILES_INDEX, file_info['id'])
+    if 'sha256' in file_info:
+        pipe.delete(digest_key(file_info['sha256']))
+    pipe.set(FILES_VERSION, ulid.new().str)
+    pipe.execute()
+
+# Helper function to delete a stored file
+# A file that is already gone (the disk was wiped on a restart) counts as deleted
+def remove_stored_file(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+# Helper function to drop records whose files are no longer on disk
+# Render's free web services lose their local disk on every restart and
+# spin-down while the records live on in Redis
+def reconcile_files():
+    for file_info in list_file_info():
+        if not os.path.exists(file_info['path']):
+            remove_file_info(file_info)
+
+# Helper function to sanitize an uploaded filename
+def safe_filename(name):
+    return name.translate(FILENAME_TABLE).strip(' .') or 'file'
+
+# Helper function to send a stored file with Range and ETag support
+# Stored files never change and ids are never reused, so id and size
+# identify the content without another stat()
+def send_stored_file(file_info):
+    response = send_file(
+        os.path.abspath(file_info['path']),
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=file_info['filename'],
+        conditional=True,
+        etag=f"{file_info['id']}-{file_info['size_bytes']}"
+    )
+    # Werkzeug only advertises ranges when answering a Range request
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
 # Helper function to format file size
+# Sizes never change once stored and clients tend to send the same ones
+@functools.lru_cache(maxsize=4096)
 def format_size(size_bytes):
-    if size_bytes < 1024:
-        return f"{size_bytes} bytes"
-    elif size_bytes < 1024 * 1024:
-        return f"{size_bytes/1024:.1f} KB"
-    elif size_bytes < 1024 * 1024 * 1024:
-        return f"{size_bytes/(1024*1024):.1f} MB"
-    else:
-        return f"{size_bytes/(1024*1024*1024):.1f} GB"
+    for divisor, unit in SIZE_UNITS:
+        if size_bytes >= divisor:
+            return '%.1f %s' % (size_bytes / divisor, unit)
+    return '%d bytes' % size_bytes
+
+# File target that counts and hashes the bytes it writes, saving a
+# stat() and a second pass over the file afterwards, and notes whether
+# the parser reached the end of its part
+class SizedFileTarget(FileTarget):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.finished = False
+
+    def on_data_received(self, chunk):
+        super().on_data_received(chunk)
+        self.size += len(chunk)
+        self.digest.update(chunk)
+
+    def on_finish(self):
+        super().on_finish()
+        self.finished = True
+
+# Helper function to feed the request body to a writer on the disk threads
+# The next chunk is read from the socket while the previous one is written
+def pump_upload(write):
+    pending = None
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if pending is not None:
+                pending.result(timeout=UPLOAD_WRITE_TIMEOUT)
+                pending = None
+            if not chunk:
+                break
+            pending = DISK_EXECUTOR.submit(write, chunk)
+    finally:
+        # If reading failed (disconnect, 413), let the write in flight finish
+        # before the caller closes the file under it; the read error wins
+        if pending is not None:
+            pending.exception(timeout=UPLOAD_WRITE_TIMEOUT)
+
+# Helper function to stream a multipart upload straight to disk
+def stream_upload(file_path):
+    file_target = SizedFileTarget(file_path)
+    api_key_target = ValueTarget()
+
+    parser = StreamingFormDataParser(headers=request.headers)
+    parser.register('file', file_target)
+    parser.register('api_key', api_key_target)
+
+    try:
+        pump_upload(parser.data_received)
+    finally:
+        # A body cut off before the file part's closing boundary never
+        # finishes the target, which would leave its file open
+        finished = file_target.finished
+        if not finished:
+            file_target.on_finish()
+    if not finished:
+        raise ParseFailedException('Upload ended before the file part finished')
+
+    return file_target, api_key_target.value.decode('utf-8', 'replace')
+
+# Helper function to copy a raw (non-multipart) request body straight to disk
+# The file is removed again if the body is rejected (413) or cut off
+def stream_raw_upload(file_path):
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'wb') as f:
+            def write(chunk):
+                f.write(chunk)
+                digest.update(chunk)
+            pump_upload(write)
+            return f.tell(), digest.hexdigest()
+    except Exception:
+        discard_upload(file_path)
+        raise
+
+# Helper function to hash a file already on disk
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Helper function to remove a partially written upload
+def discard_upload(file_path):
+    if os.path.exists(file_path):
+        os.remove(file_path)
 
 # Home route - Web Interface
 @app.route('/')
@@ -196,122 +529,362 @@ def index():
     # Calculate base URL for API documentation
     base_url = request.url_root.rstrip('/')
     
-    # Add formatted size to each file
-    for file in FILES:
-        file['size_formatted'] = format_size(file['size_bytes'])
-    
-    return render_template_string(
-        HTML_TEMPLATE, 
+    return INDEX_TEMPLATE.render(
         api_key=API_KEY,
-        files=FILES,
+        files=list_file_info(),
         base_url=base_url
     )
 
 # API: Upload file
 @app.route('/api/upload', methods=['POST'])
+@require_api_key
 def api_upload():
-    # Verify API key
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or auth_header != f'Bearer {API_KEY}':
-        return jsonify({'error': 'Unauthorized'}), 403
+    # Stream the file to disk
+    file_id = ulid.new().str
+    file_path = os.path.join(UPLOAD_FOLDER, file_id)
     
-    # Check if file is included
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part in the request'}), 400
+    if request.mimetype == 'application/octet-stream':
+        # Raw upload: the body is the file and X-Filename carries its name
+        original_name = unquote(request.headers.get('X-Filename', ''))
+        if not original_name:
+            return jsonify({'error': 'No file selected'}), 400
+        
+        size_bytes, sha256 = stream_raw_upload(file_path)
+    else:
+        try:
+            file, _ = stream_upload(file_path)
+        except ParseFailedException:
+            discard_upload(file_path)
+            return jsonify({'error': 'No file part in the request'}), 400
+        except Exception:
+            discard_upload(file_path)
+            raise
+        
+        # Check if file is included
+        if file.multipart_filename is None:
+            discard_upload(file_path)
+            return jsonify({'error': 'No file part in the request'}), 400
+        
+        # Check if file was selected
+        if file.multipart_filename == '':
+            discard_upload(file_path)
+            return jsonify({'error': 'No file selected'}), 400
+        
+        original_name = file.multipart_filename
+        size_bytes = file.size
+        sha256 = file.digest.hexdigest()
     
-    file = request.files['file']
+    # Record the file
+    file_info = record_file(file_id, file_path, original_name, size_bytes, sha256)
     
-    # Check if file was selected
-    if file.filename == '':
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'file_id': file_id,
+        'filename': file_info['filename'],
+        'size': file_info['size_bytes']
+    })
+
+# API: Check whether a file is already stored before uploading it
+# The client sends the file's SHA-256 as If-None-Match; 304 means the
+# server already has that content and X-File-Id says where
+@app.route('/api/upload', methods=['HEAD'])
+@require_api_key
+def api_upload_check():
+    for digest in request.if_none_match.as_set():
+        file_info = find_file_by_digest(digest)
+        if file_info:
+            response = Response(status=304)
+            response.set_etag(digest)
+            response.headers['X-File-Id'] = file_info['id']
+            return response
+    return Response(status=200)
+
+# API: Check how much of a resumable upload the server already has
+# X-Received is the offset the client should continue sending from; for a
+# file that is already stored it is the whole size
+@app.route('/api/upload/<digest>', methods=['HEAD'])
+@require_api_key
+def api_resume_check(digest):
+    file_path = resume_path(digest)
+    if file_path is None:
+        return Response(status=400)
+    file_info = find_file_by_digest(digest)
+    response = Response(status=200)
+    if file_info:
+        response.headers['X-Received'] = str(file_info['size_bytes'])
+        response.headers['X-File-Id'] = file_info['id']
+    else:
+        response.headers['X-Received'] = str(received_size(file_path))
+    return response
+
+# API: Send (the rest of) a resumable upload
+# The body is the slice of the file given by Content-Range, which must start
+# at X-Received (or "bytes */<size>" if every byte already arrived). Once
+# the last byte arrives the content is checked against the digest and the
+# file is recorded. Finishing an upload that is already stored returns its
+# record, so a client that lost the response can safely retry. Requests for
+# the same digest run one at a time; the others get 409 and should retry
+@app.route('/api/upload/<digest>', methods=['PUT'])
+@require_api_key
+def api_resume_upload(digest):
+    file_path = resume_path(digest)
+    if file_path is None:
+        return jsonify({'error': 'Invalid SHA-256 digest'}), 400
+    
+    # Check the upload parameters
+    original_name = unquote(request.headers.get('X-Filename', ''))
+    if not original_name:
         return jsonify({'error': 'No file selected'}), 400
+    content_range = parse_content_range_header(request.headers.get('Content-Range'))
+    if content_range is None or content_range.length is None:
+        return jsonify({'error': 'Invalid Content-Range'}), 400
+    size = content_range.length
+    if size > MAX_CONTENT_LENGTH:
+        return jsonify({'error': 'File too large'}), 413
+    # "bytes */<size>" sends nothing more and just finishes the upload
+    start = size if content_range.start is None else content_range.start
     
-    # Save and record the file
-    filename = secure_filename(file.filename)
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_FOLDER, file_id)
+    # One request at a time: a dropped attempt may still be draining
+    lock = acquire_resume_lock(digest)
+    if lock is None:
+        return jsonify({'error': 'Upload already in progress'}), 409
+    try:
+        # Already stored: the upload finished but its response never arrived
+        file_info = find_file_by_digest(digest)
+        if file_info and start == size == file_info['size_bytes']:
+            return jsonify({
+                'message': 'File already uploaded',
+                'file_id': file_info['id'],
+                'filename': file_info['filename'],
+                'size': file_info['size_bytes']
+            })
+        
+        # Only append: anything else means the client has the wrong offset
+        received = received_size(file_path)
+        if start != received:
+            response = jsonify({'error': f'Expected offset {received}', 'received': received})
+            response.status_code = 416
+            response.headers['X-Received'] = str(received)
+            return response
+        
+        # Track the file so it is removed if the client never comes back
+        pending_name = os.path.basename(file_path)
+        expire_stale_uploads()
+        redis_client.zadd(UPLOADS_PENDING, {pending_name: time.time()})
+        
+        with open(file_path, 'ab') as f:
+            pump_upload(f.write)
+            received = f.tell()
+        if received > size:
+            discard_upload(file_path)
+            redis_client.zrem(UPLOADS_PENDING, pending_name)
+            return jsonify({'error': f'Expected {size} bytes, got {received}'}), 400
+        if received < size:
+            response = jsonify({'received': received})
+            response.status_code = 202
+            response.headers['X-Received'] = str(received)
+            return response
+        
+        # Verify the assembled file on a disk thread before keeping it
+        if DISK_EXECUTOR.submit(hash_file, file_path).result() != digest:
+            discard_upload(file_path)
+            redis_client.zrem(UPLOADS_PENDING, pending_name)
+            return jsonify({'error': 'SHA-256 mismatch'}), 400
+        
+        # Record the file
+        file_id = ulid.new().str
+        stored_path = os.path.join(UPLOAD_FOLDER, file_id)
+        os.rename(file_path, stored_path)
+        redis_client.zrem(UPLOADS_PENDING, pending_name)
+        file_info = record_file(file_id, stored_path, original_name, size, digest)
+    finally:
+        release_resume_lock(digest, lock)
+    
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'file_id': file_id,
+        'filename': file_info['filename'],
+        'size': file_info['size_bytes']
+    })
+
+# API: Start a multipart upload
+# The client then PUTs each part_size slice of the file, in any order and
+# concurrently, and finally asks for the upload to be completed
+@app.route('/api/uploads', methods=['POST'])
+@require_api_key
+def api_create_multipart_upload():
+    params = request.get_json(silent=True) or {}
+    filename = params.get('filename')
+    size = params.get('size')
+    part_size = params.get('part_size')
     
-    file.save(file_path)
+    # Check the upload parameters
+    if not filename:
+        return jsonify({'error': 'No file selected'}), 400
+    # type() rather than isinstance(): JSON true and false are ints to Python
+    if type(size) is not int or type(part_size) is not int or size < 0 or part_size <= 0:
+        return jsonify({'error': 'Invalid size or part_size'}), 400
+    if part_size < MIN_PART_SIZE and part_size < size:
+        return jsonify({'error': f'part_size must be at least {MIN_PART_SIZE} bytes'}), 400
+    if size > MAX_CONTENT_LENGTH:
+        return jsonify({'error': 'File too large'}), 413
     
-    # Store file metadata
-    file_info = {
-        'id': file_id,
+    expire_stale_uploads()
+    
+    # Preallocate the file so parts can be written at their offsets
+    upload_id = ulid.new().str
+    file_path = os.path.join(UPLOAD_FOLDER, upload_id)
+    with open(file_path, 'wb') as f:
+        f.truncate(size)
+    
+    redis_client.hset(upload_key(upload_id), mapping={
         'filename': filename,
         'path': file_path,
-        'size_bytes': os.path.getsize(file_path),
-        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    FILES.append(file_info)
+        'size': size,
+        'part_size': part_size
+    })
+    touch_upload(upload_id)
+    
+    return jsonify({'upload_id': upload_id, 'part_size': part_size})
+
+# API: Upload one part of a multipart upload
+@app.route('/api/uploads/<upload_id>/part/<int:part_number>', methods=['PUT'])
+@require_api_key
+def api_upload_part(upload_id, part_number):
+    # Get upload info
+    upload = redis_client.hgetall(upload_key(upload_id))
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    # Work out where this part goes
+    size = int(upload['size'])
+    part_size = int(upload['part_size'])
+    offset = part_number * part_size
+    expected = min(part_size, size - offset)
+    if expected < 0 or (expected == 0 and part_number > 0):
+        return jsonify({'error': 'Invalid part number'}), 400
+    # Check the length up front: a longer body would overwrite the next part
+    if request.content_length != expected:
+        return jsonify({'error': f'Expected {expected} bytes, got {request.content_length}'}), 400
+    
+    # Write the part in place
+    with open(upload['path'], 'r+b') as f:
+        f.seek(offset)
+        pump_upload(f.write)
+        written = f.tell() - offset
+    if written != expected:
+        return jsonify({'error': f'Expected {expected} bytes, got {written}'}), 400
+    
+    redis_client.sadd(upload_parts_key(upload_id), part_number)
+    touch_upload(upload_id)
+    return jsonify({'part': part_number, 'size': written})
+
+# API: Finish a multipart upload once every part has arrived
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@require_api_key
+def api_complete_multipart_upload(upload_id):
+    # Get upload info
+    upload = redis_client.hgetall(upload_key(upload_id))
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    # Check that every part was received
+    size = int(upload['size'])
+    part_count = max(1, -(-size // int(upload['part_size'])))
+    received = redis_client.scard(upload_parts_key(upload_id))
+    if received != part_count:
+        return jsonify({'error': f'Received {received} of {part_count} parts'}), 400
+    
+    # Record the file
+    # Parts arrive out of order, so hash the assembled file on a disk thread
+    sha256 = DISK_EXECUTOR.submit(hash_file, upload['path']).result()
+    file_info = record_file(upload_id, upload['path'], upload['filename'], size, sha256)
+    redis_client.delete(upload_key(upload_id), upload_parts_key(upload_id))
+    redis_client.zrem(UPLOADS_PENDING, upload_id)
     
     return jsonify({
         'message': 'File uploaded successfully',
-        'file_id': file_id,
-        'filename': filename,
+        'file_id': upload_id,
+        'filename': file_info['filename'],
         'size': file_info['size_bytes']
     })
 
 # Web Interface: Upload file
 @app.route('/upload-web', methods=['POST'])
 def web_upload():
-    # Verify API key
-    api_key = request.form.get('api_key')
-    if api_key != API_KEY:
+    # Stream the file to disk
+    file_id = ulid.new().str
+    file_path = os.path.join(UPLOAD_FOLDER, file_id)
+    
+    try:
+        file, api_key = stream_upload(file_path)
+    except ParseFailedException:
+        discard_upload(file_path)
+        return "No file part in the request", 400
+    except Exception:
+        discard_upload(file_path)
+        raise
+    
+    # Verify API key (it arrives in the form body, after the file)
+    if not check_api_key(api_key):
+        discard_upload(file_path)
         return "Unauthorized", 403
     
     # Check if file is included
-    if 'file' not in request.files:
+    if file.multipart_filename is None:
+        discard_upload(file_path)
         return "No file part in the request", 400
     
-    file = request.files['file']
-    
     # Check if file was selected
-    if file.filename == '':
+    if file.multipart_filename == '':
+        discard_upload(file_path)
         return "No file selected", 400
     
-    # Save and record the file
-    filename = secure_filename(file.filename)
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_FOLDER, file_id)
-    
-    file.save(file_path)
-    
-    # Store file metadata
-    file_info = {
-        'id': file_id,
-        'filename': filename,
-        'path': file_path,
-        'size_bytes': os.path.getsize(file_path),
-        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    FILES.append(file_info)
+    # Record the file
+    record_file(file_id, file_path, file.multipart_filename, file.size, file.digest.hexdigest())
     
     return redirect(url_for('index'))
 
 # API: List files
 @app.route('/api/files', methods=['GET'])
+@require_api_key
 def api_list_files():
-    # Verify API key
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or auth_header != f'Bearer {API_KEY}':
-        return jsonify({'error': 'Unauthorized'}), 403
+    global FILES_JSON_CACHE
     
-    # Return file list
-    return jsonify({
-        'files': [{
-            'id': f['id'],
-            'filename': f['filename'],
-            'size': f['size_bytes'],
-            'timestamp': f['timestamp']
-        } for f in FILES]
-    })
+    # Rebuild the cached body only when the registry has changed
+    version = redis_client.get(FILES_VERSION)
+    if version is None:
+        # Redis was emptied: start a new version rather than reuse an old one
+        redis_client.set(FILES_VERSION, ulid.new().str, nx=True)
+        version = redis_client.get(FILES_VERSION)
+    cached_version, body, gzip_body = FILES_JSON_CACHE
+    if cached_version != version:
+        body = orjson.dumps({
+            'files': [{
+                'id': f['id'],
+                'filename': f['filename'],
+                'size': f['size_bytes'],
+                'timestamp': f['timestamp']
+            } for f in list_file_info()]
+        })
+        gzip_body = gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN_SIZE else b''
+        FILES_JSON_CACHE = (version, body, gzip_body)
+    
+    # Return file list, or 304 if the client already has this version
+    if gzip_body and request.accept_encodings['gzip']:
+        response = Response(gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f'files-{version}-gzip')
+    else:
+        response = Response(body, mimetype='application/json')
+        response.set_etag(f'files-{version}')
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
 
 # API: Download file
 @app.route('/api/download/<file_id>', methods=['GET'])
+@require_api_key
 def api_download_file(file_id):
-    # Verify API key
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or auth_header != f'Bearer {API_KEY}':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     # Get file info
     file_info = get_file_info(file_id)
     if not file_info:
@@ -319,14 +892,10 @@ def api_download_file(file_id):
     
     # Return file
     try:
-        with open(file_info['path'], 'rb') as f:
-            return app.response_class(
-                f.read(),
-                mimetype='application/octet-stream',
-                headers={
-                    'Content-Disposition': f'attachment; filename={file_info["filename"]}'
-                }
-            )
+        return send_stored_file(file_info)
+    except FileNotFoundError:
+        remove_file_info(file_info)
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
@@ -335,7 +904,7 @@ def api_download_file(file_id):
 def web_download_file(file_id):
     # Verify API key
     api_key = request.args.get('api_key')
-    if api_key != API_KEY:
+    if not check_api_key(api_key):
         return "Unauthorized", 403
     
     # Get file info
@@ -345,25 +914,17 @@ def web_download_file(file_id):
     
     # Return file
     try:
-        with open(file_info['path'], 'rb') as f:
-            return app.response_class(
-                f.read(),
-                mimetype='application/octet-stream', 
-                headers={
-                    'Content-Disposition': f'attachment; filename={file_info["filename"]}'
-                }
-            )
+        return send_stored_file(file_info)
+    except FileNotFoundError:
+        remove_file_info(file_info)
+        return "File not found", 404
     except Exception as e:
         return f"Error downloading file: {str(e)}", 500
 
 # API: Delete file
 @app.route('/api/files/<file_id>', methods=['DELETE'])
+@require_api_key
 def api_delete_file(file_id):
-    # Verify API key
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or auth_header != f'Bearer {API_KEY}':
-        return jsonify({'error': 'Unauthorized'}), 403
-    
     # Get file info
     file_info = get_file_info(file_id)
     if not file_info:
@@ -371,10 +932,9 @@ def api_delete_file(file_id):
     
     # Delete file
     try:
-        os.remove(file_info['path'])
-        # Remove from list
-        global FILES
-        FILES = [f for f in FILES if f['id'] != file_id]
+        remove_stored_file(file_info['path'])
+        # Remove from the registry
+        remove_file_info(file_info)
         return jsonify({'message': 'File deleted successfully'})
     except Exception as e:
         return jsonify({'error': f'Error deleting file: {str(e)}'}), 500
@@ -384,7 +944,7 @@ def api_delete_file(file_id):
 def web_delete_file(file_id):
     # Verify API key
     api_key = request.args.get('api_key')
-    if api_key != API_KEY:
+    if not check_api_key(api_key):
         return "Unauthorized", 403
     
     # Get file info
@@ -394,14 +954,19 @@ def web_delete_file(file_id):
     
     # Delete file
     try:
-        os.remove(file_info['path'])
-        # Remove from list
-        global FILES
-        FILES = [f for f in FILES if f['id'] != file_id]
+        remove_stored_file(file_info['path'])
+        # Remove from the registry
+        remove_file_info(file_info)
         return redirect(url_for('index'))
     except Exception as e:
         return f"Error deleting file: {str(e)}", 500
 
+# Forget files lost with the disk since the last start
+try:
+    reconcile_files()
+except redis.RedisError as e:
+    print(f"Could not check stored files: {e}")
+
 if __name__ == '__main__':
     # In development
     port = int(os.environ.get('PORT', 5000))
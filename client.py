@@ -1,14 +1,123 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import mmap
 import os
 import sys
 import json
 import time
 import shlex
+import argparse
+from types import SimpleNamespace
+from urllib.parse import quote
+from email.message import Message
+from email.utils import collapse_rfc2231_value
+
+# Optional: concurrent transfers (multipart uploads, range downloads and
+# whole-directory commands) need aiohttp and aiofiles
+try:
+    import aiohttp
+    import aiofiles
+except ImportError:
+    aiohttp = None
+
+# Optional: httpx sends bulk deletes concurrently, multiplexed over HTTP/2
+# when the h2 package is also installed
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Optional: tqdm draws transfer progress bars; without it a plain text
+# progress line is printed instead
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+# Optional: orjson parses API responses several times faster than json
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 CONFIG_FILE = "filetransfer_config.json"
+# Parsed config and the mtime of the file it was read from
+CONFIG_CACHE = None
+CONFIG_MTIME = None
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Read size for single-stream downloads
+PROGRESS_INTERVAL = 0.1  # Seconds between progress line updates
+PART_SIZE = 32 * 1024 * 1024  # Files larger than this are uploaded in parts
+RANGE_SIZE = 16 * 1024 * 1024  # Files at least this large are downloaded in ranges
+MAX_CONCURRENCY = 10  # Parts or ranges in flight at once
+RESUME_ATTEMPTS = 5  # Times a dropped single-request upload is resumed
+
+# One session for the whole run so commands reuse pooled keep-alive connections
+# Failed connections are retried with backoff. Requests that fail after
+# their body was sent are retried only for idempotent methods other than
+# PUT: resumable PUTs must continue from the server's offset (see
+# upload_resumable) rather than be re-sent from the start
+SESSION = requests.Session()
+ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                      max_retries=Retry(total=3, backoff_factor=0.3,
+                                        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS - {"PUT"}))
+SESSION.mount("https://", ADAPTER)
+SESSION.mount("http://", ADAPTER)
+# Offer every encoding urllib3 can decode here, zstd and br included when
+# zstandard or brotli is installed, so JSON responses come back compressed
+SESSION.headers["Accept-Encoding"] = ACCEPT_ENCODING
+# Stored files are sent as-is; don't ask for them to be compressed again
+IDENTITY = {"Accept-Encoding": "identity"}
+
+# Auth header and endpoint URLs of the configured server, built once by
+# apply_config; SESSION sends the header itself, aiohttp and httpx get a copy
+AUTH_HEADERS = {}
+URLS = SimpleNamespace()
+
+def apply_config(config):
+    api = f"{config['server_url']}/api"
+    AUTH_HEADERS["Authorization"] = f"Bearer {config['api_key']}"
+    SESSION.headers.update(AUTH_HEADERS)
+    URLS.upload = f"{api}/upload"
+    URLS.uploads = f"{api}/uploads"
+    URLS.files = f"{api}/files"
+    URLS.download = f"{api}/download"
+    return config
+
+HELP_TEXT = """
+File Transfer Client
+==================================================
+Commands:
+  upload <filepath>              - Upload a file to the server
+  upload <directory>             - Upload every file in a directory concurrently
+  list                           - List all files on the server
+  download <file_id> [filepath]  - Download a file from the server
+  download_all [directory]       - Download every file on the server concurrently
+  upload-many <path> [path...]   - Upload several files concurrently
+  download-many <file_id> [file_id...] [-o directory]
+                                 - Download several files concurrently
+  delete <file_id> [file_id...]  - Delete one or more files from the server
+  web                            - Open server in web browser
+  config                         - Update server URL and API key
+  help                           - Show this help message
+  exit                           - Exit the program
+Options:
+  --sync                         - Transfer one file at a time
+==================================================
+"""
 
 def load_config():
-    if not os.path.exists(CONFIG_FILE):
+    global CONFIG_CACHE, CONFIG_MTIME
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime is None:
         print("First-time setup: Please enter your server details.")
         server_url = input("Enter the server URL (e.g., https://your-app.onrender.com): ")
         api_key = input("Enter the API key (from server): ")
@@ -19,17 +128,50 @@ def load_config():
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config, f)
         print(f"Configuration saved to {CONFIG_FILE}")
-        return config
+        return apply_config(config)
     else:
+        # Reuse the parsed config until the file changes
+        if CONFIG_CACHE is not None and mtime == CONFIG_MTIME:
+            return CONFIG_CACHE
         try:
             with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
+                CONFIG_CACHE = json.load(f)
+            CONFIG_MTIME = mtime
+            return apply_config(CONFIG_CACHE)
         except Exception as e:
             print(f"Error loading configuration: {str(e)}")
             os.remove(CONFIG_FILE)
             return load_config()
 
-def upload_file(file_path, config):
+def parse_json(response):
+    # Parse the raw bytes, skipping the text decode response.json() does
+    return json_loads(response.content)
+
+def error_message(response):
+    # Proxies answer some errors (502, 504) with HTML instead of the API's JSON
+    try:
+        return parse_json(response).get('error', 'Unknown error')
+    except ValueError:
+        return f"HTTP {response.status_code}"
+
+async def error_message_async(response):
+    # The aiohttp counterpart of error_message
+    try:
+        return json_loads(await response.read()).get('error', 'Unknown error')
+    except ValueError:
+        return f"HTTP {response.status}"
+
+def file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        # Python < 3.11
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+def upload_file(file_path, sync=False):
     # Normalize path
     file_path = os.path.abspath(file_path.strip('"\''))
 
@@ -37,129 +179,556 @@ def upload_file(file_path, config):
         print(f"Error: File {file_path} not found.")
         return False
 
+    if os.path.isdir(file_path):
+        return upload_dir(file_path, sync)
+
     try:
         file_size = os.path.getsize(file_path)
         print(f"Uploading {file_path} ({file_size/1024:.1f} KB)...")
 
-        url = f"{config['server_url']}/api/upload"
-        headers = {"Authorization": f"Bearer {config['api_key']}"}
-
-        with open(file_path, 'rb') as f:
-            files = {'file': (os.path.basename(file_path), f)}
-            start_time = time.time()
-            response = requests.post(url, files=files, headers=headers)
-            elapsed_time = time.time() - start_time
-
-            if response.status_code == 200:
-                result = response.json()
-                print("Upload successful.")
-                print(f"File ID: {result['file_id']}")
-                print(f"Size: {result['size']/1024:.1f} KB")
-                print(f"Transfer rate: {file_size/1024/elapsed_time:.1f} KB/s")
-                return True
-            else:
-                print(f"Upload failed: {response.json().get('error', 'Unknown error')}")
+        # Skip the transfer if the server already has this content
+        digest = file_digest(file_path)
+        response = SESSION.head(URLS.upload, headers={"If-None-Match": f'"{digest}"'})
+        if response.status_code == 304:
+            print(f"File already on server.\nFile ID: {response.headers.get('X-File-Id')}")
+            return True
+
+        start_time = time.time()
+        if aiohttp and file_size > PART_SIZE:
+            # Large files go up as concurrent parts
+            result = asyncio.run(upload_file_async(file_path))
+        elif file_size:
+            response = upload_resumable(file_path, file_size, digest)
+            if response.status_code != 200:
+                print(f"Upload failed: {error_message(response)}")
+                return False
+            result = parse_json(response)
+        else:
+            # Empty files cannot be mapped and have nothing to resume
+            headers = {
+                "Content-Type": "application/octet-stream",
+                "X-Filename": quote(os.path.basename(file_path))
+            }
+            response = SESSION.post(URLS.upload, data=b'', headers=headers)
+
+            if response.status_code != 200:
+                print(f"Upload failed: {error_message(response)}")
                 return False
+            result = parse_json(response)
+        elapsed_time = time.time() - start_time
+
+        print(f"Upload successful.\n"
+              f"File ID: {result['file_id']}\n"
+              f"Size: {result['size']/1024:.1f} KB\n"
+              f"Transfer rate: {file_size/1024/elapsed_time:.1f} KB/s")
+        return True
     except Exception as e:
         print(f"Upload error: {str(e)}")
         return False
 
-def list_files(config):
+def upload_resumable(file_path, file_size, digest):
+    url = f"{URLS.upload}/{digest}"
+
+    # Send the file itself as the body, read through a memory map of the page
+    # cache; requests sets Content-Length from what is left after the seek
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for attempt in range(RESUME_ATTEMPTS):
+            # Continue from whatever an earlier, interrupted upload left behind
+            response = SESSION.head(url)
+            offset = int(response.headers.get('X-Received', '0'))
+            if offset:
+                print(f"Resuming from {offset/1024:.1f} KB...")
+
+            if offset < file_size:
+                content_range = f"bytes {offset}-{file_size - 1}/{file_size}"
+            else:
+                # Every byte arrived but the upload was never finished
+                content_range = f"bytes */{file_size}"
+            headers = {
+                "Content-Type": "application/octet-stream",
+                "Content-Range": content_range,
+                "X-Filename": quote(os.path.basename(file_path))
+            }
+            try:
+                mm.seek(offset)
+                with progress_bar("Uploading", file_size, offset) as bar:
+                    response = SESSION.put(url, data=ProgressReader(mm, bar), headers=headers)
+            except requests.ConnectionError:
+                if attempt == RESUME_ATTEMPTS - 1:
+                    raise
+                print("Connection lost, resuming...")
+                time.sleep(2 ** attempt)
+                continue
+            # 416 means the server holds more than the HEAD said (part of a
+            # dropped attempt arrived after it); ask again and continue
+            if response.status_code == 416:
+                continue
+            # 409 means that dropped attempt is still being received; wait
+            # for it to end before asking again
+            if response.status_code != 409 or attempt == RESUME_ATTEMPTS - 1:
+                return response
+            time.sleep(2 ** attempt)
+        return response
+
+async def upload_file_async(file_path, part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, headers=AUTH_HEADERS) as session:
+        with progress_bar("Uploading", os.path.getsize(file_path)) as bar:
+            return await upload_parts_async(session, file_path, part_size, max_concurrency, bar)
+
+async def upload_parts_async(session, file_path, part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY, bar=None):
+    file_size = os.path.getsize(file_path)
+
+    # Start the upload
+    params = {"filename": os.path.basename(file_path), "size": file_size, "part_size": part_size}
+    async with session.post(URLS.uploads, json=params) as response:
+        if response.status != 200:
+            raise RuntimeError(await error_message_async(response))
+        result = json_loads(await response.read())
+    upload_url = f"{URLS.uploads}/{result['upload_id']}"
+
+    # Send every part, at most max_concurrency at a time
+    part_count = max(1, -(-file_size // part_size))
+    ranges = [(i * part_size, min((i + 1) * part_size, file_size)) for i in range(part_count)]
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def send_part(i, start, end):
+        async with sem:
+            async with aiofiles.open(file_path, 'rb') as f:
+                await f.seek(start)
+                data = await f.read(end - start)
+            async with session.put(f"{upload_url}/part/{i}", data=data) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"Part {i}: {await error_message_async(response)}")
+            if bar:
+                bar.update(end - start)
+
+    await asyncio.gather(*(send_part(i, start, end) for i, (start, end) in enumerate(ranges)))
+
+    # Assemble the file on the server
+    async with session.post(f"{upload_url}/complete") as response:
+        if response.status != 200:
+            raise RuntimeError(await error_message_async(response))
+        return json_loads(await response.read())
+
+async def file_chunks(file_path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    async with aiofiles.open(file_path, 'rb') as f:
+        while True:
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+async def upload_one_async(session, file_path, sem):
+    file_size = os.path.getsize(file_path)
+    digest = await asyncio.get_running_loop().run_in_executor(None, file_digest, file_path)
+    async with sem:
+        # Skip the transfer if the server already has this content
+        async with session.head(URLS.upload, headers={"If-None-Match": f'"{digest}"'}) as response:
+            if response.status == 304:
+                print(f"Already on server: {file_path} (File ID: {response.headers.get('X-File-Id')})")
+                return {'file_id': response.headers.get('X-File-Id')}
+
+        if file_size > PART_SIZE:
+            result = await upload_parts_async(session, file_path)
+        else:
+            headers = {
+                "Content-Type": "application/octet-stream",
+                "Content-Length": str(file_size),
+                "X-Filename": quote(os.path.basename(file_path))
+            }
+            async with session.post(URLS.upload, data=file_chunks(file_path), headers=headers) as response:
+                if response.status != 200:
+                    raise RuntimeError(await error_message_async(response))
+                result = json_loads(await response.read())
+    print(f"Uploaded {file_path} (File ID: {result['file_id']})")
+    return result
+
+async def upload_many_async(file_paths, max_concurrency=MAX_CONCURRENCY):
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, headers=AUTH_HEADERS) as session:
+        return await asyncio.gather(
+            *(upload_one_async(session, path, sem) for path in file_paths),
+            return_exceptions=True
+        )
+
+def upload_dir(dir_path, sync=False):
+    file_paths = sorted(entry.path for entry in os.scandir(dir_path) if entry.is_file())
+    if not file_paths:
+        print(f"No files in {dir_path}.")
+        return False
+    return upload_many(file_paths, sync)
+
+def upload_many(file_paths, sync=False):
+    if sync or not aiohttp:
+        results = [upload_file(path) for path in file_paths]
+        return all(results)
+
+    print(f"Uploading {len(file_paths)} files...")
+    start_time = time.time()
+    results = asyncio.run(upload_many_async(file_paths))
+    elapsed_time = time.time() - start_time
+
+    # Report every failure and the summary in one write
+    lines = [f"Upload error: {path}: {str(result)}"
+             for path, result in zip(file_paths, results) if isinstance(result, Exception)]
+    failed = len(lines)
+    lines.append(f"Uploaded {len(file_paths) - failed} of {len(file_paths)} files in {elapsed_time:.1f}s")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return failed == 0
+
+def list_files():
     try:
-        url = f"{config['server_url']}/api/files"
-        headers = {"Authorization": f"Bearer {config['api_key']}"}
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(URLS.files)
 
         if response.status_code == 200:
-            files = response.json().get('files', [])
+            files = parse_json(response).get('files', [])
             if not files:
                 print("No files on server.")
             else:
-                print(f"{'ID':<36} | {'Filename':<30} | {'Size':<10} | {'Uploaded':<20}")
-                print("-" * 100)
-                for file in files:
-                    print(f"{file['id']:<36} | {file['filename']:<30} | {file['size']/1024:.1f} KB | {file['timestamp']:<20}")
+                # Build the whole table and write it in one call
+                rows = [f"{'ID':<36} | {'Filename':<30} | {'Size':<10} | {'Uploaded':<20}", "-" * 100]
+                rows.extend(
+                    f"{file['id']:<36} | {file['filename']:<30} | {file['size']/1024:.1f} KB | {file['timestamp']:<20}"
+                    for file in files
+                )
+                sys.stdout.write("\n".join(rows) + "\n")
         else:
-            print(f"List failed: {response.json().get('error', 'Unknown error')}")
+            print(f"List failed: {error_message(response)}")
     except Exception as e:
         print(f"Error listing files: {str(e)}")
 
-def download_file(file_id, output_path, config):
+def show_progress(label, done, total):
+    if total:
+        sys.stdout.write(f"\r{label}: {done/1024:.1f} / {total/1024:.1f} KB ({done*100//total}%)")
+    else:
+        sys.stdout.write(f"\r{label}: {done/1024:.1f} KB")
+    sys.stdout.flush()
+
+# Text progress line with the slice of tqdm's interface the transfers use
+class TextProgress:
+    def __init__(self, label, total, initial=0):
+        self.label = label
+        self.total = total
+        self.n = initial
+        self.last_print = 0.0
+
+    def update(self, n):
+        self.n += n
+        now = time.monotonic()
+        if now - self.last_print >= PROGRESS_INTERVAL or self.n == self.total:
+            self.last_print = now
+            show_progress(self.label, self.n, self.total)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.stdout.write("\n")
+
+def progress_bar(label, total, initial=0):
+    if tqdm:
+        return tqdm(total=total, initial=initial, desc=label, unit='B', unit_scale=True, unit_divisor=1024)
+    return TextProgress(label, total, initial)
+
+# Request body over a memory map that reports each read to a progress bar;
+# len() is what is left after the seek, which requests uses for Content-Length
+class ProgressReader:
+    def __init__(self, mm, bar):
+        self.mm = mm
+        self.bar = bar
+
+    def __len__(self):
+        return len(self.mm) - self.mm.tell()
+
+    def read(self, size=-1):
+        chunk = self.mm.read(size)
+        if chunk:
+            self.bar.update(len(chunk))
+        return chunk
+
+def download_path(response, file_id, output_path):
+    filename = None
+    content_disposition = response.headers.get('content-disposition')
+    if content_disposition:
+        # Prefer the RFC 2231 filename* form, which carries non-ASCII names
+        message = Message()
+        message['content-disposition'] = content_disposition
+        for key, value in message.get_params(header='content-disposition', failobj=[]):
+            if key == 'filename' and (filename is None or isinstance(value, tuple)):
+                filename = os.path.basename(collapse_rfc2231_value(value))
+    if output_path and os.path.isdir(output_path):
+        return os.path.join(output_path, filename or f"download_{file_id}")
+    elif output_path:
+        return output_path
+    else:
+        return filename or f"download_{file_id}"
+
+def download_file(file_id, output_path):
     output_path = output_path.strip('"\'')
 
     try:
-        url = f"{config['server_url']}/api/download/{file_id}"
-        headers = {"Authorization": f"Bearer {config['api_key']}"}
-        response = requests.get(url, headers=headers, stream=True)
+        url = f"{URLS.download}/{file_id}"
+
+        # Large files the server can serve in ranges are fetched concurrently
+        head = SESSION.head(url, headers=IDENTITY)
+        total_size = int(head.headers.get('content-length', 0))
+        if (aiohttp and hasattr(os, 'pwrite') and head.status_code == 200
+                and head.headers.get('accept-ranges') == 'bytes' and total_size >= RANGE_SIZE):
+            file_path = download_path(head, file_id, output_path)
+            with progress_bar("Downloading", total_size) as bar:
+                asyncio.run(download_ranges_async(url, file_path, total_size, bar=bar))
+            print(f"File downloaded to {file_path}")
+            return
+
+        response = SESSION.get(url, headers=IDENTITY, stream=True)
 
         if response.status_code == 200:
-            filename = None
-            content_disposition = response.headers.get('content-disposition')
-            if content_disposition and 'filename=' in content_disposition:
-                filename = content_disposition.split('filename=')[1].strip('"\'')
-            if output_path and os.path.isdir(output_path):
-                file_path = os.path.join(output_path, filename or f"download_{file_id}")
-            elif output_path:
-                file_path = output_path
-            else:
-                file_path = filename or f"download_{file_id}"
+            file_path = download_path(response, file_id, output_path)
 
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(8192):
+            total_size = int(response.headers.get('content-length', 0))
+            # Read the urllib3 response directly, skipping iter_content's generator
+            response.raw.decode_content = True
+            with open(file_path, 'wb') as f, progress_bar("Downloading", total_size or None) as bar:
+                while True:
+                    chunk = response.raw.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
                     f.write(chunk)
+                    bar.update(len(chunk))
 
             print(f"File downloaded to {file_path}")
         else:
-            print(f"Download failed: {response.text}")
+            print(f"Download failed: {error_message(response)}")
+    except Exception as e:
+        print(f"Download error: {str(e)}")
+
+async def download_range(session, url, start, end, fd, sem, writer, bar=None):
+    async with sem, session.get(url, headers={"Range": f"bytes={start}-{end - 1}"}) as response:
+        if response.status != 206:
+            raise RuntimeError(f"Range {start}-{end - 1}: HTTP {response.status}")
+        data = await response.read()
+    # Write on a thread so other ranges keep streaming meanwhile
+    await asyncio.get_running_loop().run_in_executor(writer, os.pwrite, fd, data, start)
+    if bar:
+        bar.update(end - start)
+
+async def download_ranges_async(url, file_path, total_size, range_size=RANGE_SIZE, max_concurrency=MAX_CONCURRENCY, bar=None):
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT, 0o644)
+    completed = False
+    try:
+        os.ftruncate(fd, total_size)
+        sem = asyncio.Semaphore(max_concurrency)
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        # Leaving the with block waits for every write already handed to the
+        # pool, so none can still be using fd when it is closed
+        with ThreadPoolExecutor(max_workers=max_concurrency) as writer:
+            async with aiohttp.ClientSession(connector=connector, headers=AUTH_HEADERS) as session:
+                tasks = [
+                    asyncio.ensure_future(download_range(
+                        session, url, start, min(start + range_size, total_size), fd, sem, writer, bar))
+                    for start in range(0, total_size, range_size)
+                ]
+                try:
+                    await asyncio.gather(*tasks)
+                except BaseException:
+                    # One range failed: stop the others rather than leave them running
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+        completed = True
+    finally:
+        os.close(fd)
+        if not completed:
+            # Don't leave a preallocated, partly filled file behind
+            os.remove(file_path)
+
+async def download_one_async(session, file, file_path, sem):
+    async with sem, session.get(f"{URLS.download}/{file['id']}") as response:
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}")
+        async with aiofiles.open(file_path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                await f.write(chunk)
+    print(f"File downloaded to {file_path}")
+
+async def download_many_async(targets, max_concurrency=MAX_CONCURRENCY):
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, headers=AUTH_HEADERS) as session:
+        return await asyncio.gather(
+            *(download_one_async(session, file, path, sem) for file, path in targets),
+            return_exceptions=True
+        )
+
+def fetch_files():
+    response = SESSION.get(URLS.files)
+    if response.status_code != 200:
+        print(f"List failed: {error_message(response)}")
+        return None
+    return parse_json(response).get('files', [])
+
+def download_all(output_dir, sync=False):
+    try:
+        files = fetch_files()
+        if files is None:
+            return
+        if not files:
+            print("No files on server.")
+            return
+        download_many(files, output_dir, sync)
+    except Exception as e:
+        print(f"Download error: {str(e)}")
+
+def download_ids(file_ids, output_dir, sync=False):
+    try:
+        files = fetch_files()
+        if files is None:
+            return
+        # Look the names up in one listing rather than a HEAD per file
+        files_by_id = {file['id']: file for file in files}
+        missing = [f"Download error: {file_id}: File not found\n" for file_id in file_ids if file_id not in files_by_id]
+        sys.stdout.write("".join(missing))
+        files = [files_by_id[file_id] for file_id in dict.fromkeys(file_ids) if file_id in files_by_id]
+        if files:
+            download_many(files, output_dir, sync)
+    except Exception as e:
+        print(f"Download error: {str(e)}")
+
+def download_many(files, output_dir, sync=False):
+    output_dir = output_dir.strip('"\'')
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        if sync or not aiohttp:
+            for file in files:
+                download_file(file['id'], output_dir)
+            return
+
+        # Give each file its own path, prefixing the id when names repeat
+        targets = []
+        used_names = set()
+        for file in files:
+            name = os.path.basename(file['filename']) or f"download_{file['id']}"
+            if name in used_names:
+                name = f"{file['id']}_{name}"
+            used_names.add(name)
+            targets.append((file, os.path.join(output_dir, name)))
+
+        print(f"Downloading {len(targets)} files to {output_dir}...")
+        start_time = time.time()
+        results = asyncio.run(download_many_async(targets))
+        elapsed_time = time.time() - start_time
+
+        # Report every failure and the summary in one write
+        lines = [f"Download error: {file['filename']}: {str(result)}"
+                 for (file, path), result in zip(targets, results) if isinstance(result, Exception)]
+        failed = len(lines)
+        lines.append(f"Downloaded {len(targets) - failed} of {len(targets)} files in {elapsed_time:.1f}s")
+        sys.stdout.write("\n".join(lines) + "\n")
     except Exception as e:
         print(f"Download error: {str(e)}")
 
-def delete_file(file_id, config):
+def delete_file(file_id):
     try:
-        url = f"{config['server_url']}/api/files/{file_id}"
-        headers = {"Authorization": f"Bearer {config['api_key']}"}
-        response = requests.delete(url, headers=headers)
+        response = SESSION.delete(f"{URLS.files}/{file_id}")
         if response.status_code == 200:
             print("File deleted successfully.")
         else:
-            print(f"Delete failed: {response.json().get('error', 'Unknown error')}")
+            print(f"Delete failed: {error_message(response)}")
+    except Exception as e:
+        print(f"Delete error: {str(e)}")
+
+async def delete_many_async(file_ids):
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=8)
+    try:
+        client = httpx.AsyncClient(http2=True, headers=AUTH_HEADERS, limits=limits)
+    except ImportError:
+        # No h2: still concurrent, over up to 8 HTTP/1.1 connections
+        client = httpx.AsyncClient(headers=AUTH_HEADERS, limits=limits)
+
+    async with client:
+        return await asyncio.gather(
+            *(client.delete(f"{URLS.files}/{file_id}") for file_id in file_ids),
+            return_exceptions=True
+        )
+
+def delete_files(file_ids):
+    if len(file_ids) == 1 or not httpx:
+        for file_id in file_ids:
+            delete_file(file_id)
+        return
+
+    try:
+        responses = asyncio.run(delete_many_async(file_ids))
     except Exception as e:
         print(f"Delete error: {str(e)}")
+        return
+
+    # Collect one line per file and write them all at once
+    lines = []
+    for file_id, response in zip(file_ids, responses):
+        if isinstance(response, Exception):
+            lines.append(f"Delete error: {file_id}: {str(response)}\n")
+        elif response.status_code == 200:
+            lines.append(f"Deleted {file_id}.\n")
+        else:
+            lines.append(f"Delete failed: {file_id}: {error_message(response)}\n")
+    sys.stdout.write("".join(lines))
 
 def update_config():
+    global CONFIG_CACHE
+    CONFIG_CACHE = None
     if os.path.exists(CONFIG_FILE):
         os.remove(CONFIG_FILE)
     return load_config()
 
 def show_help():
-    print("\nFile Transfer Client")
-    print("=" * 50)
-    print("Commands:")
-    print("  upload <filepath>              - Upload a file to the server")
-    print("  list                           - List all files on the server")
-    print("  download <file_id> [filepath]  - Download a file from the server")
-    print("  delete <file_id>               - Delete a file from the server")
-    print("  web                            - Open server in web browser")
-    print("  config                         - Update server URL and API key")
-    print("  help                           - Show this help message")
-    print("  exit                           - Exit the program")
-    print("=" * 50)
+    sys.stdout.write(HELP_TEXT)
 
 def open_web_interface(config):
     import webbrowser
     webbrowser.open(config['server_url'])
 
 def parse_command(command_line):
+    # Only quoted input needs shlex's tokenizer
+    if '"' not in command_line and "'" not in command_line:
+        return command_line.split()
     try:
         return shlex.split(command_line)
     except ValueError as e:
         print(f"Parse error: {str(e)}")
         return []
 
-def interactive_mode():
+# Helper function to pull "-o <directory>" out of interactive arguments
+def split_output_dir(args):
+    if "-o" in args[:-1]:
+        i = args.index("-o")
+        return args[:i] + args[i + 2:], args[i + 1]
+    return args, "."
+
+# Interactive commands: name -> (minimum arguments, handler(args, config, sync))
+# "config" and "exit" are handled in the loop since they change its state
+COMMANDS = {
+    "upload": (1, lambda args, config, sync: upload_file(args[0], sync)),
+    "list": (0, lambda args, config, sync: list_files()),
+    "download": (1, lambda args, config, sync: download_file(args[0], args[1] if len(args) >= 2 else ".")),
+    "download_all": (0, lambda args, config, sync: download_all(args[0] if args else ".", sync)),
+    "upload-many": (1, lambda args, config, sync: upload_many(args, sync)),
+    "download-many": (1, lambda args, config, sync: download_ids(*split_output_dir(args), sync)),
+    "delete": (1, lambda args, config, sync: delete_files(args)),
+    "web": (0, lambda args, config, sync: open_web_interface(config)),
+    "help": (0, lambda args, config, sync: show_help()),
+}
+
+def interactive_mode(sync=False):
     config = load_config()
-    print(f"\nConnected to: {config['server_url']}")
-    print("Type 'help' for commands")
+    print(f"\nConnected to: {config['server_url']}\nType 'help' for commands")
 
     while True:
         try:
@@ -172,23 +741,14 @@ def interactive_mode():
                 continue
 
             cmd = parts[0].lower()
+            args = parts[1:]
+            min_args, handler = COMMANDS.get(cmd, (0, None))
 
-            if cmd == "upload" and len(parts) >= 2:
-                upload_file(parts[1], config)
-            elif cmd == "list":
-                list_files(config)
-            elif cmd == "download" and len(parts) >= 2:
-                output_path = parts[2] if len(parts) >= 3 else "."
-                download_file(parts[1], output_path, config)
-            elif cmd == "delete" and len(parts) >= 2:
-                delete_file(parts[1], config)
-            elif cmd == "web":
-                open_web_interface(config)
+            if handler and len(args) >= min_args:
+                handler(args, config, sync)
             elif cmd == "config":
                 config = update_config()
                 print(f"Updated. Connected to: {config['server_url']}")
-            elif cmd == "help":
-                show_help()
             elif cmd in ["exit", "quit"]:
                 print("Exiting...")
                 break
@@ -200,31 +760,68 @@ def interactive_mode():
         except Exception as e:
             print(f"Unexpected error: {str(e)}")
 
+def build_parser():
+    # --sync is accepted before or after the command; the copy after it
+    # leaves the flag alone unless given, so it can't reset the one before
+    sync_parser = argparse.ArgumentParser(add_help=False)
+    sync_parser.add_argument("--sync", action="store_true", default=argparse.SUPPRESS,
+                             help="transfer one file at a time")
+
+    parser = argparse.ArgumentParser(description="File Transfer Client")
+    parser.add_argument("--sync", action="store_true", help="transfer one file at a time")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    upload = commands.add_parser("upload", parents=[sync_parser], help="upload a file or directory")
+    upload.add_argument("path")
+    upload_many_parser = commands.add_parser("upload-many", parents=[sync_parser], help="upload several files concurrently")
+    upload_many_parser.add_argument("paths", nargs="+")
+    commands.add_parser("list", help="list all files on the server")
+    download = commands.add_parser("download", help="download a file")
+    download.add_argument("file_id")
+    download.add_argument("output", nargs="?", default=".")
+    download_many_parser = commands.add_parser("download-many", parents=[sync_parser], help="download several files concurrently")
+    download_many_parser.add_argument("file_ids", nargs="+")
+    download_many_parser.add_argument("-o", "--output-dir", default=".")
+    download_all_parser = commands.add_parser("download_all", parents=[sync_parser], help="download every file on the server")
+    download_all_parser.add_argument("output_dir", nargs="?", default=".")
+    delete = commands.add_parser("delete", help="delete one or more files")
+    delete.add_argument("file_ids", nargs="+")
+    commands.add_parser("web", help="open the server in a web browser")
+    commands.add_parser("config", help="update server URL and API key")
+    commands.add_parser("help", help="show the command reference")
+    return parser
+
 def main():
-    if len(sys.argv) < 2:
-        interactive_mode()
+    args = build_parser().parse_args()
+
+    if args.command is None:
+        interactive_mode(args.sync)
+        return
+    if args.command == "help":
+        show_help()
+        return
+    if args.command == "config":
+        update_config()
         return
 
+    # Load the config and open the session once for the whole batch
     config = load_config()
-    command = sys.argv[1].lower()
-
-    if command == "upload" and len(sys.argv) >= 3:
-        upload_file(sys.argv[2], config)
-    elif command == "list":
-        list_files(config)
-    elif command == "download" and len(sys.argv) >= 3:
-        output_path = sys.argv[3] if len(sys.argv) >= 4 else "."
-        download_file(sys.argv[2], output_path, config)
-    elif command == "delete" and len(sys.argv) >= 3:
-        delete_file(sys.argv[2], config)
-    elif command == "web":
+    if args.command == "upload":
+        upload_file(args.path, args.sync)
+    elif args.command == "upload-many":
+        upload_many(args.paths, args.sync)
+    elif args.command == "list":
+        list_files()
+    elif args.command == "download":
+        download_file(args.file_id, args.output)
+    elif args.command == "download-many":
+        download_ids(args.file_ids, args.output_dir, args.sync)
+    elif args.command == "download_all":
+        download_all(args.output_dir, args.sync)
+    elif args.command == "delete":
+        delete_files(args.file_ids)
+    elif args.command == "web":
         open_web_interface(config)
-    elif command == "config":
-        update_config()
-    elif command == "help":
-        show_help()
-    else:
-        print("Invalid command. Use 'python client.py help' for guidance.")
 
 if __name__ == "__main__":
     main()